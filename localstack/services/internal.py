@@ -1,11 +1,17 @@
 """Module for localstack internal resources, such as health, graph, or _localstack/cloudformation/deploy. """
+import itertools
 import json
 import logging
 import os
-from collections import defaultdict
-from typing import List, Optional
+import re
+import threading
+import time
+from functools import lru_cache
+from operator import attrgetter
+from typing import Iterable, List, Optional
 
 import requests
+from plugin import PluginManager
 from werkzeug.exceptions import NotFound
 
 from localstack import config, constants
@@ -13,25 +19,39 @@ from localstack.deprecations import deprecated_endpoint
 from localstack.http import Request, Response, Router
 from localstack.http.adapters import RouterListener
 from localstack.http.dispatcher import resource_dispatcher
+from localstack.runtime import hooks
+from localstack.runtime.init import Script, Stage, init_script_manager
 from localstack.services.infra import SHUTDOWN_INFRA, terminate_all_processes_in_docker
+from localstack.services.plugins import SERVICE_PLUGINS
 from localstack.utils.collections import merge_recursive
 from localstack.utils.files import load_file
 from localstack.utils.functions import call_safe
-from localstack.utils.json import parse_json_or_yaml
+from localstack.utils.json import CustomEncoder, parse_json_or_yaml
 from localstack.utils.server.http2_server import HTTP_METHODS
 
 LOG = logging.getLogger(__name__)
 
 
+def _json_response(result: dict) -> Response:
+    """
+    Creates a JSON response with compact separators from the given dict, for the frequently polled resources.
+    """
+    return Response(
+        json.dumps(result, cls=CustomEncoder, separators=(",", ":")), mimetype="application/json"
+    )
+
+
 class DeprecatedResource:
     """
     Resource class which wraps a given resource in the deprecated_endpoint (i.e. logs deprecation warnings on every
     invocation).
     """
 
+    # names of the resource methods which handle HTTP requests (on_get, on_post, ...)
+    HANDLER_NAMES = tuple(f"on_{http_method.lower()}" for http_method in HTTP_METHODS)
+
     def __init__(self, resource, previous_path: str, deprecation_version: str, new_path: str):
-        for http_method in HTTP_METHODS:
-            fn_name = f"on_{http_method.lower()}"
+        for fn_name in self.HANDLER_NAMES:
             fn = getattr(resource, fn_name, None)
             if fn:
                 wrapped = deprecated_endpoint(
@@ -43,6 +63,9 @@ class DeprecatedResource:
                 setattr(self, fn_name, wrapped)
 
 
+_state_value = attrgetter("value")
+
+
 class HealthResource:
     """
     Resource for the LocalStack /health endpoint. It provides access to the service states and other components of
@@ -68,22 +91,22 @@ class HealthResource:
         return Response("ok", 200)
 
     def on_get(self, request: Request):
-        path = request.path
-
-        reload = "reload" in path
-
-        # get service state
-        if reload:
+        # get service state, optionally re-checking all services (e.g., GET /_localstack/health?reload)
+        if "reload" in request.args:
             self.service_manager.check_all()
-        services = {
-            service: state.value for service, state in self.service_manager.get_states().items()
-        }
+        states = self.service_manager.get_states()
+        services = dict(zip(states.keys(), map(_state_value, states.values())))
+
+        # service states explicitly put into the internal state take precedence (unless they are None)
+        if isinstance(self.state.get("services"), dict):
+            services.update(
+                (service, state)
+                for service, state in self.state["services"].items()
+                if state is not None
+            )
 
-        # build state dict from internal state and merge into it the service states
-        result = dict(self.state)
-        result = merge_recursive({"services": services}, result)
-        result["version"] = constants.VERSION
-        return result
+        # build state dict from internal state, and add the service states and version
+        return _json_response({**self.state, "services": services, "version": constants.VERSION})
 
     def on_head(self, _request: Request):
         return Response("ok", 200)
@@ -92,7 +115,7 @@ class HealthResource:
         data = request.get_json(True, True) or {}
 
         # keys like "features:initScripts" should be interpreted as ['features']['initScripts']
-        state = defaultdict(dict)
+        state = {}
         for k, v in data.items():
             if ":" in k:
                 path = k.split(":")
@@ -101,7 +124,7 @@ class HealthResource:
 
             d = state
             for p in path[:-1]:
-                d = state[p]
+                d = d.setdefault(p, {})
             d[path[-1]] = v
 
         self.state = merge_recursive(state, self.state, overwrite=True)
@@ -109,26 +132,24 @@ class HealthResource:
 
 
 class CloudFormationUi:
-    def on_get(self, request):
-        from localstack.utils.aws.aws_stack import get_valid_regions
+    # placeholders in deploy.html which are substituted when rendering the page
+    PLACEHOLDER_PATTERN = re.compile(r"<(stackName|templateBody|errorMessage|regions)>")
+    # limits for downloading templates passed via templateURL
+    MAX_TEMPLATE_BYTES = 5 * 1024 * 1024
+    DOWNLOAD_TIMEOUT = (3, 10)
 
-        deploy_html_file = os.path.join(
-            constants.MODULE_MAIN_PATH, "services", "cloudformation", "deploy.html"
-        )
-        deploy_html = load_file(deploy_html_file)
+    def on_get(self, request):
         req_params = request.values
         params = {
-            "stackName": "stack1",
             "templateBody": "{}",
             "errorMessage": "''",
-            "regions": json.dumps(sorted(list(get_valid_regions()))),
         }
 
         download_url = req_params.get("templateURL")
         if download_url:
             try:
                 LOG.debug("Attempting to download CloudFormation template URL: %s", download_url)
-                template_body = requests.get(download_url).text
+                template_body = self._download_template(download_url)
                 template_body = parse_json_or_yaml(template_body)
                 params["templateBody"] = json.dumps(template_body)
             except Exception as e:
@@ -136,15 +157,80 @@ class CloudFormationUi:
                 LOG.info(msg)
                 params["errorMessage"] = json.dumps(msg.replace("\n", " - "))
 
-        # using simple string replacement here, for simplicity (could be replaced with, e.g., jinja)
-        for key, value in params.items():
-            deploy_html = deploy_html.replace(f"<{key}>", value)
+        # substitute the request-specific placeholders in a single pass over the cached base page (the static
+        # placeholders are already rendered by _get_base_html)
+        deploy_html = self.PLACEHOLDER_PATTERN.sub(
+            lambda match: params[match.group(1)], self._get_base_html()
+        )
 
         return Response(deploy_html, mimetype="text/html")
 
+    def _download_template(self, url: str) -> str:
+        """
+        Downloads the template from the given URL, reading at most MAX_TEMPLATE_BYTES from the response.
+        """
+        with requests.get(url, timeout=self.DOWNLOAD_TIMEOUT, stream=True) as response:
+            response.raise_for_status()
+            if response.headers.get("Content-Type", "").startswith("text/html"):
+                raise ValueError("URL returned an HTML document instead of a template")
+
+            content = bytearray()
+            for chunk in response.iter_content(chunk_size=65536):
+                content.extend(chunk)
+                if len(content) > self.MAX_TEMPLATE_BYTES:
+                    raise ValueError(
+                        f"template exceeds maximum size of {self.MAX_TEMPLATE_BYTES} bytes"
+                    )
+
+            return content.decode(response.encoding or "utf-8", errors="replace")
+
+    @classmethod
+    @lru_cache()
+    def _get_base_html(cls) -> str:
+        """
+        Loads deploy.html once and pre-renders the placeholders which do not depend on the request. The
+        request-specific placeholders are left in place.
+        """
+        from localstack.utils.aws.aws_stack import get_valid_regions
+
+        deploy_html_file = os.path.join(
+            constants.MODULE_MAIN_PATH, "services", "cloudformation", "deploy.html"
+        )
+        params = {
+            "stackName": "stack1",
+            "regions": json.dumps(sorted(list(get_valid_regions()))),
+        }
+        return cls.PLACEHOLDER_PATTERN.sub(
+            lambda match: params.get(match.group(1), match.group(0)), load_file(deploy_html_file)
+        )
+
 
 class DiagnoseResource:
+    """
+    Resource for the diagnose endpoint. The report is cached for a short time, so that a burst of requests
+    results in only one round of docker inspections and file system walks. The report is built while holding
+    the lock, i.e., concurrent requests wait for the running report instead of building their own.
+    """
+
+    CACHE_TTL = 2.0
+    # clock used to determine the age of the cached report
+    _clock = staticmethod(time.monotonic)
+
+    def __init__(self) -> None:
+        self._mutex = threading.Lock()
+        self._cached_report: Optional[dict] = None
+        self._cached_at = 0.0
+
     def on_get(self, request):
+        with self._mutex:
+            if self._cached_report is None or self._clock() - self._cached_at >= self.CACHE_TTL:
+                self._cached_report = self._create_report()
+                self._cached_at = self._clock()
+            report = self._cached_report
+        return _json_response(report)
+
+    @staticmethod
+    def _create_report() -> dict:
         from localstack.utils import diagnose
 
         return {
@@ -171,11 +257,6 @@ class PluginsResource:
     """
 
     def on_get(self, request):
-        from plugin import PluginManager
-
-        from localstack.runtime import hooks
-        from localstack.services.plugins import SERVICE_PLUGINS
-
         plugin_managers: List[PluginManager] = [
             SERVICE_PLUGINS.plugin_manager,
             hooks.configure_localstack_container.manager,
@@ -195,38 +276,43 @@ class PluginsResource:
 
             return details
 
-        return {
-            manager.namespace: [get_plugin_details(manager, name) for name in manager.list_names()]
-            for manager in plugin_managers
-        }
+        return _json_response(
+            {
+                manager.namespace: [
+                    get_plugin_details(manager, name) for name in manager.list_names()
+                ]
+                for manager in plugin_managers
+            }
+        )
+
+
+_init_script_attributes = attrgetter("stage.name", "path", "state.name")
+
+
+def _describe_init_scripts(scripts: Iterable[Script]) -> List[dict]:
+    basename = os.path.basename
+    return [
+        {"stage": stage, "name": basename(path), "state": state}
+        for stage, path, state in map(_init_script_attributes, scripts)
+    ]
 
 
 class InitScriptsResource:
     def on_get(self, request):
-        from localstack.runtime.init import init_script_manager
-
         manager = init_script_manager()
 
-        return {
-            "completed": {
-                stage.name: completed for stage, completed in manager.stage_completed.items()
-            },
-            "scripts": [
-                {
-                    "stage": script.stage.name,
-                    "name": os.path.basename(script.path),
-                    "state": script.state.name,
-                }
-                for scripts in manager.scripts.values()
-                for script in scripts
-            ],
-        }
+        return _json_response(
+            {
+                "completed": {
+                    stage.name: completed for stage, completed in manager.stage_completed.items()
+                },
+                "scripts": _describe_init_scripts(itertools.chain(*manager.scripts.values())),
+            }
+        )
 
 
 class InitScriptsStageResource:
     def on_get(self, request, stage: str):
-        from localstack.runtime.init import Stage, init_script_manager
-
         manager = init_script_manager()
 
         try:
@@ -234,17 +320,12 @@ class InitScriptsStageResource:
         except KeyError as e:
             raise NotFound(f"no such stage {stage}") from e
 
-        return {
-            "completed": manager.stage_completed.get(stage),
-            "scripts": [
-                {
-                    "stage": script.stage.name,
-                    "name": os.path.basename(script.path),
-                    "state": script.state.name,
-                }
-                for script in manager.scripts.get(stage)
-            ],
-        }
+        return _json_response(
+            {
+                "completed": manager.stage_completed.get(stage),
+                "scripts": _describe_init_scripts(manager.scripts.get(stage)),
+            }
+        )
 
 
 class LocalstackResources(Router):
@@ -258,8 +339,6 @@ class LocalstackResources(Router):
         # TODO: load routes as plugins
 
     def add_default_routes(self):
-        from localstack.services.plugins import SERVICE_PLUGINS
-
         health_resource = HealthResource(SERVICE_PLUGINS)
         plugins_resource = PluginsResource()
 
@@ -296,6 +375,8 @@ class LocalstackResourceHandler(RouterListener):
     Adapter to serve LocalstackResources through the edge proxy.
     """
 
+    INTERNAL_PATH_PREFIX = constants.INTERNAL_RESOURCE_PATH + "/"
+
     resources: LocalstackResources
 
     def __init__(self, resources: LocalstackResources = None) -> None:
@@ -305,7 +386,7 @@ class LocalstackResourceHandler(RouterListener):
         try:
             return super().forward_request(method, path, data, headers)
         except NotFound:
-            if not path.startswith(constants.INTERNAL_RESOURCE_PATH + "/"):
+            if not path.startswith(self.INTERNAL_PATH_PREFIX):
                 # only return 404 if we're accessing an internal resource, otherwise fall back to the other listeners
                 return True
             else:
@@ -314,6 +395,7 @@ class LocalstackResourceHandler(RouterListener):
 
 
 INTERNAL_APIS: Optional[LocalstackResources] = None
+_INTERNAL_APIS_LOCK = threading.Lock()
 
 
 def get_internal_apis() -> LocalstackResources:
@@ -321,6 +403,8 @@ def get_internal_apis() -> LocalstackResources:
     Get the LocalstackResources singleton.
     """
     global INTERNAL_APIS
-    if not INTERNAL_APIS:
-        INTERNAL_APIS = LocalstackResources()
+    if INTERNAL_APIS is None:
+        with _INTERNAL_APIS_LOCK:
+            if INTERNAL_APIS is None:
+                INTERNAL_APIS = LocalstackResources()
     return INTERNAL_APIS
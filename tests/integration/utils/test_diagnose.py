@@ -6,7 +6,7 @@ from localstack.services.internal import DiagnoseResource
 def test_diagnose_resource():
     # simple smoke test diagnose resource
     resource = DiagnoseResource()
-    result = resource.on_get(Request(path="/_localstack/diagnose"))
+    result = resource.on_get(Request(path="/_localstack/diagnose")).json
 
     assert "/tmp" in result["file-tree"]
     assert "/var/lib/localstack" in result["file-tree"]
@@ -1,15 +1,67 @@
+import json
 from unittest import mock
 
+import pytest
 import requests
 
 from localstack.constants import VERSION
 from localstack.http import Request
 from localstack.services.generic_proxy import ProxyListener
-from localstack.services.internal import HealthResource, LocalstackResourceHandler
+from localstack.services.internal import (
+    CloudFormationUi,
+    DeprecatedResource,
+    DiagnoseResource,
+    HealthResource,
+    LocalstackResourceHandler,
+)
 from localstack.services.plugins import ServiceManager, ServiceState
 from localstack.utils.testutil import proxy_server
 
 
+class TestDeprecatedResource:
+    def test_wraps_defined_handlers(self):
+        class Resource:
+            def on_get(self, request):
+                return "GET"
+
+            def on_post(self, request):
+                return "POST"
+
+            def on_other(self, request):
+                return "other"
+
+        class SubResource(Resource):
+            def on_put(self, request):
+                return "PUT"
+
+        resource = DeprecatedResource(
+            SubResource(), previous_path="/old", deprecation_version="1.0.0", new_path="/new"
+        )
+
+        assert {name for name in vars(resource) if name.startswith("on_")} == {
+            "on_get",
+            "on_post",
+            "on_put",
+        }
+        assert resource.on_get(Request("GET", "/old")) == "GET"
+        assert resource.on_put(Request("PUT", "/old")) == "PUT"
+
+    def test_wraps_instance_handlers(self):
+        class Resource:
+            def on_get(self, request):
+                return "GET"
+
+        resource = DeprecatedResource(
+            Resource(), previous_path="/old", deprecation_version="1.0.0", new_path="/new"
+        )
+        resource = DeprecatedResource(
+            resource, previous_path="/older", deprecation_version="1.0.0", new_path="/new"
+        )
+
+        assert {name for name in vars(resource) if name.startswith("on_")} == {"on_get"}
+        assert resource.on_get(Request("GET", "/older")) == "GET"
+
+
 class TestHealthResource:
     def test_put_and_get(self):
         service_manager = ServiceManager()
@@ -25,7 +77,7 @@ class TestHealthResource:
             )
         )
 
-        state = resource.on_get(Request("GET", "/", body=b"None"))
+        state = resource.on_get(Request("GET", "/", body=b"None")).json
 
         assert state == {
             "features": {
@@ -54,7 +106,7 @@ class TestHealthResource:
 
         resource.on_put(Request("PUT", "/", body=b'{"features:initScripts": "initialized"}'))
 
-        state = resource.on_get(Request("GET", "/", body=b"None"))
+        state = resource.on_get(Request("GET", "/", body=b"None")).json
 
         assert state == {
             "features": {
@@ -67,6 +119,182 @@ class TestHealthResource:
             "version": VERSION,
         }
 
+    def test_put_nested_and_get(self):
+        service_manager = ServiceManager()
+        service_manager.get_states = mock.MagicMock(return_value={"foo": ServiceState.AVAILABLE})
+
+        resource = HealthResource(service_manager)
+
+        resource.on_put(
+            Request(
+                "PUT",
+                "/",
+                body=b'{"a:b:c": "value1", "a:b:d": "value2", "a:e": "value3"}',
+            )
+        )
+
+        state = resource.on_get(Request("GET", "/", body=b"None")).json
+
+        assert state == {
+            "a": {
+                "b": {
+                    "c": "value1",
+                    "d": "value2",
+                },
+                "e": "value3",
+            },
+            "services": {
+                "foo": "available",
+            },
+            "version": VERSION,
+        }
+
+    def test_put_services_and_get(self):
+        service_manager = ServiceManager()
+        service_manager.get_states = mock.MagicMock(
+            return_value={"foo": ServiceState.AVAILABLE, "bar": ServiceState.AVAILABLE}
+        )
+
+        resource = HealthResource(service_manager)
+
+        resource.on_put(
+            Request("PUT", "/", body=b'{"services:foo": "running", "services:bar": null}')
+        )
+
+        state = resource.on_get(Request("GET", "/")).json
+        # explicitly set service states take precedence, unset ones fall back to the live state
+        assert state["services"] == {"foo": "running", "bar": "available"}
+
+        # the get does not change the internal state
+        assert resource.state == {"services": {"foo": "running", "bar": None}}
+        assert resource.on_get(Request("GET", "/")).json["services"] == state["services"]
+
+    def test_get_with_reload(self):
+        service_manager = ServiceManager()
+        service_manager.get_states = mock.MagicMock(return_value={"foo": ServiceState.AVAILABLE})
+        service_manager.check_all = mock.MagicMock()
+
+        resource = HealthResource(service_manager)
+
+        resource.on_get(Request("GET", "/_localstack/health/reloaded"))
+        service_manager.check_all.assert_not_called()
+
+        state = resource.on_get(Request("GET", "/_localstack/health", query_string="reload")).json
+        service_manager.check_all.assert_called_once()
+        assert state["services"] == {"foo": "available"}
+
+    def test_get_returns_compact_json(self):
+        service_manager = ServiceManager()
+        service_manager.get_states = mock.MagicMock(return_value={"foo": ServiceState.AVAILABLE})
+
+        resource = HealthResource(service_manager)
+
+        response = resource.on_get(Request("GET", "/"))
+
+        assert response.mimetype == "application/json"
+        expected = '{"services":{"foo":"available"},"version":"%s"}' % VERSION
+        assert response.get_data(True) == expected
+
+
+class TestCloudFormationUi:
+    @pytest.fixture
+    def render(self):
+        """Renders the deploy UI for a templateURL, returns the templateBody and errorMessage."""
+
+        def _render(response):
+            with mock.patch.object(
+                CloudFormationUi, "_get_base_html", return_value="<templateBody>|<errorMessage>"
+            ), mock.patch("localstack.services.internal.requests.get", return_value=response):
+                result = CloudFormationUi().on_get(
+                    Request("GET", "/", query_string="templateURL=http://example.com/template")
+                )
+            template_body, error_message = result.get_data(True).split("|")
+            return json.loads(template_body), error_message
+
+        return _render
+
+    def test_render_deploy_html(self):
+        response = CloudFormationUi().on_get(Request("GET", "/"))
+
+        html = response.get_data(True)
+        assert response.mimetype == "text/html"
+        assert not CloudFormationUi.PLACEHOLDER_PATTERN.search(html)
+        assert "const templateBody = {};" in html
+        assert 'const defaultStackName = "stack1";' in html
+        assert "const initErrorMessage = '';" in html
+        assert '"us-east-1"' in html
+
+    @staticmethod
+    def _create_response(chunks, content_type="text/plain", encoding=None, status_error=None):
+        response = mock.MagicMock()
+        response.__enter__.return_value = response
+        response.headers = {"Content-Type": content_type}
+        response.encoding = encoding
+        response.iter_content.return_value = chunks
+        if status_error:
+            response.raise_for_status.side_effect = status_error
+        return response
+
+    def test_yaml_template(self, render):
+        template_body, error_message = render(
+            self._create_response([b"Resources:\n", b"  Bucket:\n    Type: AWS::S3::Bucket\n"])
+        )
+        assert template_body == {"Resources": {"Bucket": {"Type": "AWS::S3::Bucket"}}}
+        assert error_message == "''"
+
+    def test_json_template(self, render):
+        template_body, error_message = render(
+            self._create_response([b'{"Resources": ', b"{}}"], content_type="application/json")
+        )
+        assert template_body == {"Resources": {}}
+        assert error_message == "''"
+
+    def test_template_with_invalid_bytes(self, render):
+        template_body, error_message = render(self._create_response([b"Description: caf\xe9\n"]))
+        assert template_body == {"Description": "caf\ufffd"}
+        assert error_message == "''"
+
+    def test_template_too_large(self, render):
+        with mock.patch.object(CloudFormationUi, "MAX_TEMPLATE_BYTES", 10):
+            template_body, error_message = render(self._create_response([b"a: 12345\n", b"b: 1\n"]))
+        assert template_body == {}
+        assert "exceeds maximum size" in error_message
+
+    def test_html_response(self, render):
+        template_body, error_message = render(
+            self._create_response([b"<html></html>"], content_type="text/html; charset=utf-8")
+        )
+        assert template_body == {}
+        assert "HTML document" in error_message
+
+    def test_http_error(self, render):
+        template_body, error_message = render(
+            self._create_response(
+                [b"not found"], status_error=requests.HTTPError("404 Client Error: Not Found")
+            )
+        )
+        assert template_body == {}
+        assert "404 Client Error" in error_message
+
+
+class TestDiagnoseResource:
+    def test_report_is_cached(self):
+        resource = DiagnoseResource()
+
+        with mock.patch.object(
+            DiagnoseResource, "_create_report", side_effect=[{"report": 1}, {"report": 2}]
+        ) as create_report, mock.patch.object(DiagnoseResource, "_clock") as clock:
+            clock.return_value = 100.0
+            assert resource.on_get(Request("GET", "/")).json == {"report": 1}
+
+            clock.return_value = 100.0 + DiagnoseResource.CACHE_TTL / 2
+            assert resource.on_get(Request("GET", "/")).json == {"report": 1}
+            assert create_report.call_count == 1
+
+            clock.return_value = 100.0 + DiagnoseResource.CACHE_TTL
+            assert resource.on_get(Request("GET", "/")).json == {"report": 2}
+            assert create_report.call_count == 2
+
 
 class TestLocalstackResourceHandlerIntegration:
     def test_health(self, monkeypatch):